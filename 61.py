@@ -1,36 +1,28 @@
-from typing import Iterable
 import itertools
-
-# NOTE: These are *infinite* generators, use itertools.dropwhile/takewhile
-# to make finite sub generators
-def triangular_numbers(n: int = 1) -> Iterable[int]:
-    """Generate triangular numbers starting with the n-th one."""
-    return (n*(n+1)//2 for n in itertools.count(n))
-
-
-def square_numbers(n: int = 1) -> Iterable[int]:
-    """Generate square numbers starting with the n-th one."""
-    return (n**2 for n in itertools.count(n))
-
-
-def pentagonal_numbers(n: int = 1) -> Iterable[int]:
-    """Generate pentagonal numbers starting with the n-th one."""
-    return (n*(3*n-1)//2 for n in itertools.count(n))
-
-
-def hexagonal_numbers(n: int = 1) -> Iterable[int]:
-    """Generate pentagonal numbers starting with the n-th one."""
-    return (n*(2*n - 1) for n in itertools.count(n))
-
-
-def heptagonal_numbers(n: int = 1) -> Iterable[int]:
-    """Generate heptagonal numbers starting with the n-th one."""
-    return (n*(5*n - 2)//2 for n in itertools.count(n))
-
-
-def octagonal_numbers(n: int = 1) -> Iterable[int]:
-    """Generate octagonal numbers starting with the n-th one."""
-    return (n*(3*n - 2) for n in itertools.count(n))
+import math
+
+import numpy as np
+
+# Every s-gonal number is P(n) = (a*n^2 + b*n)/2 for the right (a, b), so the
+# 4-digit members of each family are just an arange substituted into the
+# polynomial -- no generators needed.
+FIGURATE_COEFFICIENTS: dict[str, tuple[int, int]] = {
+    'triangular': (1, 1),
+    'square': (2, 0),
+    'pentagonal': (3, -1),
+    'hexagonal': (4, -2),
+    'heptagonal': (5, -3),
+    'octagonal': (6, -4),
+}
+
+
+def four_digit_figurate(a: int, b: int) -> np.ndarray:
+    """All 4-digit (base 10) values of the figurate polynomial
+    P(n) = (a*n^2 + b*n)/2, computed as a single vectorized evaluation.
+    """
+    n = np.arange(1, 200)
+    values = (a*n*n + b*n) // 2
+    return values[(values >= 1000) & (values <= 9999)]
 
 
 def is_cyclic_pair(a: int, b: int, divisor: int = 10**2) -> bool:
@@ -41,77 +33,81 @@ def is_cyclic_pair(a: int, b: int, divisor: int = 10**2) -> bool:
     return (a % divisor) == (b // divisor)
 
 
-def filter_four_digit(generator) -> tuple[int, ...]:
-    """Specific to this problem: filter a generator of numbers to only 4-digit
-    numbers in base 10.
-    """
-    return tuple(
-        itertools.takewhile(lambda x: x <= 9999,
-            itertools.dropwhile(lambda x: x < 1000,
-                generator())
-        )
-    )
-
-
-def build_next_cyclic_numbers(seed: int, *candidates: tuple[int, ...]) -> Iterable[list[int]]:
-    """Recursively build candidate chains of cyclic numbers.  The seed is the
-    first number in the chain.  candidates are the collections of numbers to
-    choose successive numbers from.  The first and last numbers are not checked
-    for cyclic behavior.
+def reconstruct_cycle(chain: tuple[int, ...], values: list[np.ndarray],
+        adjacency: list[list[np.ndarray]], start: int) -> list[int]:
+    """Extract an actual 6-cycle of distinct numbers, given the ordering of
+    types to visit (chain), the adjacency matrices between types, and the
+    index (start) of the first type's number known to close a cycle.  Returns
+    [] if every such cycle repeats a number.
     """
-    if not candidates:
-        yield []
-    else:
-        next_options = candidates[0]
-        remaining_collections = candidates[1:]
-        for next_number in next_options:
-            if is_cyclic_pair(seed, next_number):
-                for tail in build_next_cyclic_numbers(next_number, *remaining_collections):
-                    yield [next_number] + tail
+    # back[s]: which values of type chain[s] still reach start through the
+    # remaining steps of the chain
+    back: list[np.ndarray] = [np.empty(0)] * len(chain)
+    back[-1] = adjacency[chain[-1]][chain[0]][:, start]
+    for s in range(len(chain) - 2, 0, -1):
+        back[s] = adjacency[chain[s]][chain[s + 1]] @ back[s + 1]
+
+    def extend(indices: list[int]) -> list[int]:
+        s = len(indices)
+        if s == len(chain):
+            cycle = [int(values[chain[i]][k]) for i, k in enumerate(indices)]
+            # Check no duplicates
+            if len(set(cycle)) == len(cycle):
+                return cycle
+            return []
+        options = adjacency[chain[s - 1]][chain[s]][indices[s - 1]] & back[s]
+        for candidate in np.flatnonzero(options):
+            cycle = extend(indices + [candidate])
+            if cycle:
+                return cycle
+        return []
+
+    return extend([start])
 
 
 def find_the_answer() -> list[int]:
     """Find 6 distinct numbers, one from each type of geometric number
     (trangular, square, ...) that for a two digit cycle in base 10.
     """
-    types = list(map(filter_four_digit, (triangular_numbers, square_numbers,
-        pentagonal_numbers, hexagonal_numbers, heptagonal_numbers,
-        octagonal_numbers))
-    )
-
-    first = types[0]
-    rest = types[1:]
-    for first_number in first:
-        # Gotta test all possible ways to order the remaining sets:
-        for remaining_sets in itertools.permutations(rest, 5):
-            for tail in build_next_cyclic_numbers(first_number, *remaining_sets):
-                # Test the correct number of ints
-                if len(tail) == len(rest):
-                    # And that it cyles around
-                    if is_cyclic_pair(tail[-1], first_number):
-                        cycle = [first_number] + tail
-                        # Finally check no duplicates
-                        if len(set(cycle)) == len(cycle):
-                            return cycle
+    values = [four_digit_figurate(a, b) for a, b in FIGURATE_COEFFICIENTS.values()]
+    prefixes = [v // 100 for v in values]
+    suffixes = [v % 100 for v in values]
+    # adjacency[i][j][k, l]: does value k of type i cycle into value l of
+    # type j?  Boolean matrix products of these chain the relation across
+    # whole orderings of the types at C speed.
+    adjacency = [[s[:, None] == p[None, :] for p in prefixes] for s in suffixes]
+    # linkable[i][j]: is any number of type i a cyclic predecessor of any
+    # number of type j?  An ordering whose consecutive types never link
+    # cannot close a cycle, so it is discarded before any matrix work.
+    linkable = [[bool(adj.any()) for adj in row] for row in adjacency]
+
+    for ordering in itertools.permutations(range(1, len(values))):
+        chain = (0, *ordering)
+        if not all(linkable[i][j] for i, j in itertools.pairwise(chain + (0,))):
+            continue
+        # Chain the adjacencies along this ordering and back to type 0; a
+        # true diagonal entry marks a starting number that closes a cycle.
+        reach = adjacency[0][chain[1]]
+        for i, j in itertools.pairwise(chain[1:]):
+            reach = reach @ adjacency[i][j]
+        closure = reach @ adjacency[chain[-1]][0]
+        for start in np.flatnonzero(closure.diagonal()):
+            cycle = reconstruct_cycle(chain, values, adjacency, start)
+            if cycle:
+                return cycle
     return []
 
 
 def classify_number(n: int) -> list[str]:
     """Generate a list of descriptions for a number ('triangular', 'square',
-    etc)
+    etc) by inverting each figurate polynomial: n = (a*k^2 + b*k)/2 for a
+    positive integer k exactly when the quadratic formula yields one.
     """
     classifications = []
-    for name, generator in [
-        ('triangular', triangular_numbers),
-        ('square', square_numbers),
-        ('pentagonal', pentagonal_numbers),
-        ('hexagonal', hexagonal_numbers),
-        ('heptagonal', heptagonal_numbers),
-        ('octagonal', octagonal_numbers)
-    ]:
-        filtered = itertools.dropwhile(lambda x: x < n, generator())
-        filtered = itertools.takewhile(lambda x: x == n, filtered)
-        if n in filtered:
+    for name, (a, b) in FIGURATE_COEFFICIENTS.items():
+        discriminant = b*b + 8*a*n
+        root = math.isqrt(discriminant)
+        if root*root == discriminant and root >= 2*a + b and not (root - b) % (2*a):
             classifications.append(name)
     return classifications
 
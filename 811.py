@@ -3,6 +3,13 @@ import math
 import operator
 from functools import cache, reduce
 from typing import Callable, Literal
+
+import numpy as np
+try:
+    from numba import njit
+except ImportError:
+    njit = None
+
 from modular import Modular, prime_factors, primes
 
 
@@ -10,90 +17,145 @@ def zero() -> Literal[0]:
     return 0
 
 
+class _BinOp:
+    """Deferred binary operation between a Delayed's eval and another
+    operand (a plain value or another callable).  One introspectable object
+    per operation, instead of a fresh closure plus captured cells.
+    """
+    __slots__ = ('op', 'left', 'right', 'reverse')
+
+    def __init__(self, op: Callable[[int, int], int],
+            left: Callable[[], int], right, reverse: bool = False):
+        self.op = op
+        self.left = left
+        self.right = right
+        self.reverse = reverse
+
+    def __call__(self) -> int:
+        right = self.right() if callable(self.right) else self.right
+        if self.reverse:
+            return self.op(right, self.left())
+        return self.op(self.left(), right)
+
+
 class Delayed:
     eval: Callable[[], int]
 
-    def __init__(self, initial: Callable[[], int] | int, *, _str: str = ''):
+    # _repr holds the structure used to render str(self), built only on
+    # demand: None for unknown, (value,) for a literal, ('-', operand) for
+    # negation, and (op, left, right) for binary operations.  Building the
+    # string eagerly on every operation would stringify the whole expression
+    # graph at each node.
+    _repr: tuple | None
+
+    def __init__(self, initial: Callable[[], int] | int, *, _repr: tuple | None = None):
         if callable(initial):
             self.eval = initial
-            self._str = _str if _str else 'unknown'
+            self._repr = _repr
         else:
             self.eval = lambda : initial
-            self._str = str(initial)
+            self._repr = (initial,)
 
     def __str__(self) -> str:
-        return self._str
+        if self._repr is None:
+            return 'unknown'
+        elif len(self._repr) == 1:
+            return str(self._repr[0])
+        elif len(self._repr) == 2:
+            op, operand = self._repr
+            return f'{op}{operand}'
+        else:
+            op, left, right = self._repr
+            if op == '**':
+                return f'{left}**{right}'
+            return f'({left}{op}{right})'
 
     def _compute(self, other, op, reverse=False) -> Callable[[], int]:
-        if callable(other):
-            if reverse:
-                def compute() -> int:
-                    return op(other(), self.eval())
-            else:
-                def compute() -> int:
-                    return op(self.eval(), other())
-        else:
-            if reverse:
-                def compute() -> int:
-                    return op(other, self.eval())
-            else:
-                def compute() -> int:
-                    return op(self.eval(), other)
-        return compute
+        return _BinOp(op, self.eval, other, reverse)
 
     def __add__(self, other):
-        return Delayed(self._compute(other, operator.add), _str=f'({self}+{other})')
+        return Delayed(self._compute(other, operator.add), _repr=('+', self, other))
 
     def __radd__(self, other):
-        return Delayed(self._compute(other, operator.add, True), _str=f'({other}+{self})')
+        return Delayed(self._compute(other, operator.add, True), _repr=('+', other, self))
 
     def __mul__(self, other):
-        return Delayed(self._compute(other, operator.mul), _str=f'({self}*{other})')
+        return Delayed(self._compute(other, operator.mul), _repr=('*', self, other))
 
     def __rmul__(self, other):
-        return Delayed(self._compute(other, operator.mul, True), _str=f'({other}*{self})')
+        return Delayed(self._compute(other, operator.mul, True), _repr=('*', other, self))
 
     def __sub__(self, other):
-        return Delayed(self._compute(other, operator.sub), _str=f'({self}-{other})')
+        return Delayed(self._compute(other, operator.sub), _repr=('-', self, other))
 
     def __rsub__(self, other):
-        return Delayed(self._compute(other, operator.sub, True), _str=f'({other}-{self})')
+        return Delayed(self._compute(other, operator.sub, True), _repr=('-', other, self))
 
     def __neg__(self):
         def compute() -> int:
             return -self.eval()
-        return Delayed(compute, _str=f'-{self}')
+        return Delayed(compute, _repr=('-', self))
 
     def __pow__(self, other):
-        return Delayed(self._compute(other, operator.pow), _str=f'{self}**{other}')
+        return Delayed(self._compute(other, operator.pow), _repr=('**', self, other))
 
     def __rpow__(self, other):
-        return Delayed(self._compute(other, operator.pow, True), _str=f'{other}**{self}')
+        return Delayed(self._compute(other, operator.pow, True), _repr=('**', other, self))
 
     def __divmod__(self, other):
         ...
 
 
-@cache
 def b(n: int) -> int:
-    divisor = 1
-    while not n % 2:
-        n //= 2
-        divisor *= 2
-    return divisor
+    # Largest power of 2 dividing n: n & -n isolates the lowest set bit.
+    return n & -n
 
 
-@cache
 def A(n: int, mod: int) -> int:
-    if n == 0:
-        return 1
-    q, r = divmod(n, 2)
-    if r == 0:
-        # even
-        return (3*A(q, mod) + 5 * A(n - b(q), mod)) % mod
-    else:
-        # odd
-        return A(q, mod)
+    """Compute A(n) mod mod by walking the bits of n instead of recursing.
+
+    The recursion A(2q) = 3*A(q) + 5*A(2q - b(q)), A(2q+1) = A(q) unrolls to
+    a product: for n = 2^k * m with m odd, A(n) = c^k * A(m) where c depends
+    only on the number of set bits in m and satisfies c_(j+1) = 5*c_j + 3
+    with c_1 = 8.  So walking n's bits from the MSB down, each 0-bit
+    contributes a factor of c_j, with j the count of 1-bits above it.  This
+    bounds the work to one multiply per bit with no cache and no recursion
+    depth limit.
+    """
+    if n <= 1:
+        return 1 % mod
+    if njit is not None and mod <= _JIT_MOD_LIMIT:
+        # n itself can exceed int64, so hand the kernel n's bits instead:
+        # unpackbits on the big-endian bytes yields them MSB first.
+        n_bits = n.bit_length()
+        bits = np.unpackbits(np.frombuffer(
+            n.to_bytes((n_bits + 7) // 8, 'big'), dtype=np.uint8))
+        return int(_A_bit_walk(bits[-(n_bits - 1):], mod))
+    result = 1
+    factor = 8  # c_1: one 1-bit (the MSB) seen so far
+    for i in range(n.bit_length() - 2, -1, -1):
+        if (n >> i) & 1:
+            factor = (5*factor + 3) % mod
+        else:
+            result = result * factor % mod
+    return result % mod
+
+
+# The bit-walk is a pure int64 loop, exactly what Numba compiles well; keep
+# it optional, with the interpreted loop in A as the fallback.  The kernel is
+# only safe while (mod - 1)**2 fits in int64.
+_JIT_MOD_LIMIT = math.isqrt(2**63 - 1)
+if njit is not None:
+    @njit(cache=True)
+    def _A_bit_walk(bits: np.ndarray, mod: np.int64) -> np.int64:
+        result = 1 % mod
+        factor = 8 % mod
+        for bit in bits:
+            if bit:
+                factor = (5*factor + 3) % mod
+            else:
+                result = result * factor % mod
+        return result
 
 
 @cache
@@ -1,6 +1,6 @@
 # Delayed computation of algebraic expressions
 from __future__ import annotations
-from functools import partial, reduce
+from functools import cache, partial, reduce
 import itertools
 import math
 import operator
@@ -8,6 +8,11 @@ from tokenize import Exponent
 from typing import Callable, ClassVar, Iterable, TypeAlias, TypeGuard, TypeVar, cast
 from typing_extensions import Self
 
+from modular import phi
+
+# Totients are reused for every Power reduced mod the same n
+_phi = cache(phi)
+
 
 def _wrap(value: Expression | int) -> Expression:
     if isinstance(value, Expression):
@@ -25,11 +30,31 @@ def split(filter_fn: Callable[[Expression], bool], expressions: Iterable[Express
 def is_literal(expression: Expression) -> TypeGuard[Literal]:
     return isinstance(expression, Literal)
 
+
+def balanced_reduce(op: Callable[[Expression, Expression], Expression],
+        expressions: Iterable[Expression]) -> Expression:
+    """Combine expressions pairwise into a balanced tree.  A plain
+    reduce(op, ...) builds an n-deep left-linear chain; combining adjacent
+    pairs round by round keeps the depth logarithmic.
+    """
+    terms = list(expressions)
+    while len(terms) > 1:
+        combined = [op(a, b) for a, b in zip(terms[::2], terms[1::2])]
+        if len(terms) % 2:
+            combined.append(terms[-1])
+        terms = combined
+    return terms[0]
+
 def extract_literals(expressions: Iterable[Expression]) -> tuple[Iterable[Literal], Iterable[Expression]]:
     return split(is_literal, expressions)   # type: ignore
 
 
 class Expression:
+    # Set on every node simplify produces, so re-entering simplification --
+    # directly, or via the rewrite rules that rebuild and resubmit trees --
+    # never walks an already-simplified subtree again.
+    _simplified: bool = False
+
     def eval(self) -> int:
         raise NotImplementedError
 
@@ -104,12 +129,71 @@ class Expression:
     def __int__(self) -> int:
         return self.simplify().eval()
 
+    # Simplification.  Subclasses implement _subexpressions (the children
+    # that must be simplified first) and _simplify_step (combine the already
+    # simplified children into a result).  _simplify_step returns the result
+    # and a flag: True if the result is fully simplified, False if it is a
+    # rewritten tree that needs another round (where the recursive version
+    # would have tail-called .simplify() on it).
+    def _subexpressions(self) -> tuple[Expression, ...]:
+        return ()
+
+    def _simplify_step(self, simplified: dict[int, Expression]) -> tuple[Expression, bool]:
+        return self, True
+
     def simplify(self) -> Expression:
-        return self
+        """Simplify this expression with an iterative post-order walk.  An
+        explicit stack replaces the Python-level recursion (no RecursionError
+        on deep trees), and a memo keyed by node identity means shared
+        subexpressions are simplified once.
+        """
+        simplified: dict[int, Expression] = {}
+        # Nodes whose _simplify_step produced a rewritten tree: map to that
+        # tree, and adopt its result once it is simplified.
+        forwards: dict[int, Expression] = {}
+        # The memo is keyed by id(); keep every keyed node referenced so ids
+        # are not recycled mid-walk.
+        keep_alive: list[Expression] = []
+        stack = [self]
+        while stack:
+            node = stack[-1]
+            node_id = id(node)
+            if node_id in simplified:
+                stack.pop()
+                continue
+            if node._simplified:
+                simplified[node_id] = node
+                stack.pop()
+                continue
+            if node_id in forwards:
+                target = forwards[node_id]
+                result = simplified.get(id(target))
+                if result is not None:
+                    simplified[node_id] = result
+                    stack.pop()
+                else:
+                    stack.append(target)
+                continue
+            pending = [child for child in node._subexpressions()
+                       if id(child) not in simplified]
+            if pending:
+                stack.extend(pending)
+                continue
+            result, done = node._simplify_step(simplified)
+            keep_alive.append(node)
+            if done:
+                result._simplified = True
+                simplified[node_id] = result
+                stack.pop()
+            else:
+                forwards[node_id] = result
+                stack.append(result)
+        return simplified[id(self)]
 
 
 class Literal(Expression):
     value: int
+    _simplified = True
 
     def __init__(self, value: int) -> None:
         self.value = value
@@ -143,6 +227,9 @@ class Unary(Expression):
     def __init__(self, value: Expression | int) -> None:
         self.value = _wrap(value)
 
+    def _subexpressions(self) -> tuple[Expression, ...]:
+        return (self.value,)
+
 
 class Binary(Expression):
     left: Expression
@@ -151,19 +238,35 @@ class Binary(Expression):
     def __init__(self, left: Expression | int, right: Expression | int) -> None:
         self.left = _wrap(left)
         self.right = _wrap(right)
-
-    def unwrap_parens(self) -> Iterable[Expression]:
-        """Unwrap parenthesis.  Use for associative binary operations."""
+        self._unwrap_cache: tuple[Expression, ...] | None = None
+
+    def _subexpressions(self) -> tuple[Expression, ...]:
+        return (self.left, self.right)
+
+    def unwrap_parens(self) -> tuple[Expression, ...]:
+        """Unwrap parenthesis.  Use for associative binary operations.
+        Expression trees are never mutated, so the result is computed once
+        and cached: __str__ and simplification both call this, and without
+        the cache a left-leaning tree walks its whole spine again at every
+        level.
+        """
+        if self._unwrap_cache is not None:
+            return self._unwrap_cache
         unwrap_type = type(self)
-        if isinstance(self.left, unwrap_type):
-            left = self.left.unwrap_parens()
-        else:
-            left = [self.left]
-        if isinstance(self.right, unwrap_type):
-            right = self.right.unwrap_parens()
-        else:
-            right = [self.right]
-        return itertools.chain(left, right)
+        unwrapped = []
+        stack = [self.right, self.left]
+        while stack:
+            node = stack.pop()
+            if isinstance(node, unwrap_type):
+                if node._unwrap_cache is not None:
+                    unwrapped.extend(node._unwrap_cache)
+                else:
+                    stack.append(node.right)
+                    stack.append(node.left)
+            else:
+                unwrapped.append(node)
+        self._unwrap_cache = tuple(unwrapped)
+        return self._unwrap_cache
 
 
 class Sum(Binary):
@@ -177,16 +280,21 @@ class Sum(Binary):
     def __mod__(self, n: int) -> int:
         return ((self.left % n) + (self.right % n)) % n
 
-    def simplify(self) -> Expression:
-        summands = (x.simplify() for x in self.unwrap_parens())
+    def _subexpressions(self) -> tuple[Expression, ...]:
+        return tuple(self.unwrap_parens())
+
+    def _simplify_step(self, simplified: dict[int, Expression]) -> tuple[Expression, bool]:
+        summands = [simplified[id(x)] for x in self.unwrap_parens()]
         literals, nonliterals = extract_literals(summands)
         # Add all the literals up
         literal = Literal(sum(x.eval() for x in literals))
         if literal == ZERO:
-            final_summands = nonliterals
+            final_summands = list(nonliterals)
         else:
-            final_summands = itertools.chain(nonliterals, [literal])
-        return reduce(operator.add, final_summands)
+            final_summands = list(nonliterals) + [literal]
+        if not final_summands:
+            return ZERO, True
+        return balanced_reduce(operator.add, final_summands), True
 
 
 class Product(Binary):
@@ -200,15 +308,15 @@ class Product(Binary):
     def __mod__(self, n: int) -> int:
         return ((self.left % n)*(self.right % n)) % n
 
-    def simplify(self) -> Expression:
-        left = self.left.simplify()
-        right = self.right.simplify()
+    def _simplify_step(self, simplified: dict[int, Expression]) -> tuple[Expression, bool]:
+        left = simplified[id(self.left)]
+        right = simplified[id(self.right)]
         if left == ONE:
-            return right
+            return right, True
         elif right == ONE:
-            return left
+            return left, True
         elif left == ZERO or right == ZERO:
-            return ZERO
+            return ZERO, True
         elif isinstance(left, FloorDivision):
             if isinstance(right, FloorDivision):
                 numerator = left.left * right.left
@@ -216,13 +324,13 @@ class Product(Binary):
             else:
                 numerator = left.left * right
                 denominator = left.right
-            return (numerator // denominator).simplify()
+            return numerator // denominator, False
         elif isinstance(right, FloorDivision):
             numerator = left * right.left
             denominator = right.right
-            return (numerator // denominator).simplify()
+            return numerator // denominator, False
         else:
-            return left * right
+            return left * right, True
 
 
 class Power(Binary):
@@ -233,25 +341,31 @@ class Power(Binary):
         return f'{self.left}^{self.right}'
 
     def __mod__(self, n: int) -> int:
-        # TODO: Optimize?
-        return pow(self.left % n, self.right.eval(), n)
+        base = self.left % n
+        if math.gcd(base, n) == 1:
+            # Euler's theorem: reduce the exponent mod phi(n) instead of
+            # evaluating a potentially astronomical exponent tree.
+            exp = self.right % _phi(n)
+        else:
+            exp = self.right.eval()
+        return pow(base, exp, n)
 
-    def simplify(self) -> Expression:
-        base = self.left.simplify()
-        exp = self.right.simplify()
+    def _simplify_step(self, simplified: dict[int, Expression]) -> tuple[Expression, bool]:
+        base = simplified[id(self.left)]
+        exp = simplified[id(self.right)]
         if base == ONE:
-            return base
+            return base, True
         elif base == Literal(-1):
             if exp % 2:
-                return ONE
+                return ONE, True
             else:
-                return base
+                return base, True
         elif exp == ONE:
-            return base
+            return base, True
         elif exp == ZERO:
-            return ONE
+            return ONE, True
         # No other simplifications
-        return base ** exp
+        return base ** exp, True
 
 
 class FloorDivision(Binary):
@@ -264,17 +378,17 @@ class FloorDivision(Binary):
     def __mod__(self, n: int) -> int:
         return self.eval() % n
 
-    def simplify(self) -> Expression:
-        numerator = self.left.simplify()
-        denominator = self.right.simplify()
+    def _simplify_step(self, simplified: dict[int, Expression]) -> tuple[Expression, bool]:
+        numerator = simplified[id(self.left)]
+        denominator = simplified[id(self.right)]
         if denominator == ONE:
-            return numerator
+            return numerator, True
         if numerator == ZERO:
-            return ZERO
+            return ZERO, True
         if isinstance(denominator, FloorDivision):
-            return (numerator *(denominator.right // denominator.left)).simplify()
+            return numerator * (denominator.right // denominator.left), False
         if isinstance(numerator, FloorDivision):
-            return (numerator.left // (numerator.right * denominator)).simplify()
+            return numerator.left // (numerator.right * denominator), False
         # Look for cancellations
         numerators: list[Expression] = []
         denominators: list[Expression] = []
@@ -291,18 +405,21 @@ class FloorDivision(Binary):
             num_literals = list(num_literals)
             den_literals, den_others = extract_literals(denominators)
             den_literals = list(den_literals)
+            cancelled = False
             for i, num in enumerate(num_literals):
                 num = num.eval()
                 for j, den in enumerate(den_literals):
                     den = den.eval()
                     d = math.gcd(num, den)
+                    if d > 1:
+                        cancelled = True
                     num_literals[i] = Literal(num // d)
                     den_literals[j] = Literal(den // d)
-            numerator = reduce(operator.mul, itertools.chain(num_literals, num_others)).simplify()
-            denominator = reduce(operator.mul, itertools.chain(den_literals, den_others)).simplify()
-            if denominator == ONE:
-                return numerator
-        return numerator // denominator
+            if cancelled:
+                numerator = balanced_reduce(operator.mul, itertools.chain(num_literals, num_others))
+                denominator = balanced_reduce(operator.mul, itertools.chain(den_literals, den_others))
+                return numerator // denominator, False
+        return numerator // denominator, True
 
 
 class Negation(Unary):
@@ -315,13 +432,13 @@ class Negation(Unary):
     def __mod__(self, n: int) -> int:
         return -(self.value % n)
 
-    def simplify(self) -> Expression:
-        value = self.value.simplify()
+    def _simplify_step(self, simplified: dict[int, Expression]) -> tuple[Expression, bool]:
+        value = simplified[id(self.value)]
         if isinstance(value, Negation):
-            return value.value
+            return value.value, True
         elif isinstance(value, Literal):
-            return Literal(-value.value)
-        return -value
+            return Literal(-value.value), True
+        return -value, True
 
 
 class Absolute(Unary):
@@ -334,19 +451,19 @@ class Absolute(Unary):
     def __mod__(self, n: int) -> int:
         return abs(self.value.eval() % n)
 
-    def simplify(self) -> Expression:
-        value = self.value.simplify()
+    def _simplify_step(self, simplified: dict[int, Expression]) -> tuple[Expression, bool]:
+        value = simplified[id(self.value)]
         if isinstance(value, Absolute):
-            return value
+            return value, True
         elif isinstance(value, Literal):
-            return Literal(abs(value.eval()))
+            return Literal(abs(value.eval())), True
         elif isinstance(value, Negation):
-            return value.value
+            return value.value, True
         elif isinstance(value, FloorDivision):
-            return (abs(value.left) // abs(value.right)).simplify()
+            return abs(value.left) // abs(value.right), False
         elif isinstance(value, Product):
-            return (abs(value.left) * abs(value.right)).simplify()
-        return self
+            return abs(value.left) * abs(value.right), False
+        return self, True
 
 
 def b(n: Expression) -> int:
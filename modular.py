@@ -1,70 +1,95 @@
+from collections import Counter
 import itertools
 import operator
 from functools import cache, reduce
 import math
+
+import numpy as np
 from typing_extensions import Self
 
 
 @cache
-def Modular(n: int) -> type[int]:
-    """Create a integer class to perform computations mod n."""
+def Modular(n: int) -> type:
+    """Create a class to perform integer computations mod n.  Instances hold
+    a plain reduced int; arithmetic works directly on the raw values rather
+    than routing every result back through int subclass construction.
+    """
     if not isinstance(n, int):
         raise TypeError('Modulus must be an integer')
     elif n < 1:
         raise ValueError('Modulus must be positive.')
     critical_magnitude = n // 2
-    class _Modular(int):
-        def __new__(cls, value: int) -> Self:
+    class _Modular:
+        __slots__ = ('value',)
+
+        def __init__(self, value: int) -> None:
             if isinstance(value, _Modular):
-                return value
+                self.value = value.value
             else:
-                return super().__new__(cls, value % n)
+                self.value = value % n
+
+        @classmethod
+        def _make(cls, value: int) -> Self:
+            # Internal: wrap an already-reduced value, skipping __init__'s
+            # isinstance check and mod reduction.
+            result = object.__new__(cls)
+            result.value = value
+            return result
 
         def __add__(self, other: int) -> Self:
+            if isinstance(other, _Modular):
+                other = other.value
             if isinstance(other, int):
-                return type(self)(super().__add__(other))
+                return _Modular._make((self.value + other) % n)
             return NotImplemented
 
-        def __radd__(self, other: int) -> Self:
-            if isinstance(other, int):
-                return type(self)(super().__add__(other))
-            return NotImplemented
+        __radd__ = __add__
 
         def __mul__(self, other: int) -> Self:
+            if isinstance(other, _Modular):
+                other = other.value
             if isinstance(other, int):
-                return type(self)(super().__mul__(other))
+                return _Modular._make((self.value * other) % n)
             return NotImplemented
 
-        def __rmul__(self, other: int) -> Self:
-            if isinstance(other, int):
-                return type(self)(super().__mul__(other))
+        __rmul__ = __mul__
 
         def __neg__(self) -> Self:
-            return type(self)(super().__neg__())
+            return _Modular._make(-self.value % n)
 
         def __pow__(self, exp: int) -> Self:
             if isinstance(exp, int):
-                return type(self)(super().__pow__(exp, n))
+                return _Modular._make(pow(self.value, exp, n))
             return NotImplemented
 
         def __sub__(self, other: int) -> Self:
+            if isinstance(other, _Modular):
+                other = other.value
             if isinstance(other, int):
-                return type(self)(super().__sub__(other))
+                return _Modular._make((self.value - other) % n)
             return NotImplemented
 
         def __rsub__(self, other: int) -> Self:
+            if isinstance(other, _Modular):
+                other = other.value
             if isinstance(other, int):
-                return type(self)(other - int(self))
+                return _Modular._make((other - self.value) % n)
+            return NotImplemented
+
+        def __int__(self) -> int:
+            return self.value
+
+        __index__ = __int__
 
         def __str__(self) -> str:
-            return f'{super().__repr__()} (mod {n})'
+            return f'{self.value!r} (mod {n})'
 
         def __repr__(self) -> str:
-            return f'<{super().__repr__()} Mod({n})>'
+            return f'<{self.value!r} Mod({n})>'
 
         def least_positive(self) -> Self:
-            if self < 0:
-                return type(self)(self + n)
+            if self.value < 0:
+                return _Modular._make(self.value + n)
             else:
                 return self
 
@@ -73,32 +98,31 @@ def Modular(n: int) -> type[int]:
             mod n.
             """
             a = self.least_magnitude()
-            if a < 0:
+            if a.value < 0:
                 return -a
             else:
                 return a
 
         def least_magnitude(self) -> Self:
-            if self > critical_magnitude:
-                return self - n
-            elif self < -critical_magnitude:
-                return self + n
+            if self.value > critical_magnitude:
+                return _Modular._make(self.value - n)
+            elif self.value < -critical_magnitude:
+                return _Modular._make(self.value + n)
             else:
                 return self
 
         def __eq__(self, other: int) -> bool:
+            if isinstance(other, _Modular):
+                other = other.value
             if isinstance(other, int):
-                if not isinstance(other, _Modular):
-                    other = type(self)(other)
-                return int.__eq__(self - other, 0)
+                return (self.value - other) % n == 0
             return NotImplemented
 
         def __ne__(self, other: int) -> bool:
-            if isinstance(other, int):
-                if not isinstance(other, _Modular):
-                    other = type(self)(other)
-                return int.__ne__(self - other, 0)
-            return NotImplemented
+            result = self.__eq__(other)
+            if result is NotImplemented:
+                return result
+            return not result
 
     _Modular.__name__ = f'Modular[{n}]'
     _Modular.__qualname__ = f'Modular[{n}]'
@@ -107,11 +131,15 @@ def Modular(n: int) -> type[int]:
 
 def primes(n: int) -> list[int]:
     """primes < n"""
-    sieve = [True] * n
-    for i in range(3, n // 2 + 1, 2):
+    if n <= 2:
+        return []
+    sieve = np.ones(n, dtype=bool)
+    sieve[:2] = False
+    sieve[4::2] = False
+    for i in range(3, math.isqrt(n - 1) + 1, 2):
         if sieve[i]:
-            sieve[i**2: : 2*i] = [False] * ((n - i*i - 1) // (2*i) + 1)
-    return [2] + [i for i in range(3, n, 2) if sieve[i]]
+            sieve[i*i::2*i] = False
+    return np.flatnonzero(sieve).tolist()
 
 
 @cache
@@ -127,16 +155,34 @@ def nth_prime(n: int) -> int:
     raise RuntimeError('Unexpected branch')
 
 
+# Witnesses making Miller-Rabin deterministic for all n < 3.3 * 10**24.
+_MILLER_RABIN_WITNESSES = (2, 3, 5, 7, 11, 13, 17, 19, 23, 29, 31, 37)
+
+
 def is_prime(n: int) -> bool:
-    """Test an integer for primality."""
-    max_check = math.floor(math.sqrt(n))
-    for n in itertools.count(1):
-        p = nth_prime(n)
-        if p >= max_check:
-            return True
-        elif not n % p:
+    """Test an integer for primality with a deterministic Miller-Rabin test
+    (exact for all n below 3.3 * 10**24).
+    """
+    if n < 2:
+        return False
+    for p in _MILLER_RABIN_WITNESSES:
+        if not n % p:
+            return n == p
+    # Write n - 1 as d * 2**s with d odd
+    d = n - 1
+    s = (d & -d).bit_length() - 1
+    d >>= s
+    for a in _MILLER_RABIN_WITNESSES:
+        x = pow(a, d, n)
+        if x == 1 or x == n - 1:
+            continue
+        for _ in range(s - 1):
+            x = x * x % n
+            if x == n - 1:
+                break
+        else:
             return False
-    return False
+    return True
 
 
 @cache
@@ -154,26 +200,35 @@ def prime_factors2(n: int) -> tuple[tuple[int, int]]:
             factors.append(p)
             n = q
             q, r = divmod(n, p)
-    return tuple((p, len(list(g))) for p, g in itertools.groupby(factors))
+    return tuple(sorted(Counter(factors).items()))
 
 
 @cache
 def prime_factors(n: int) -> tuple[tuple[int, int]]:
-    print('Factorizing', n)
-    ps = primes(math.floor(math.sqrt(n)) + 1)
+    """Compute the prime factorization of an integer by trial division:
+    the primes 2, 3 and 5 first, then a 2-3-5 wheel of candidate divisors.
+    The sqrt bound shrinks as factors are divided out, so numbers with small
+    factors finish long before reaching sqrt of the original n.
+    """
     factors = []
-    for p in ps:
-        if n == 1:
+    for p in (2, 3, 5):
+        while not n % p:
+            factors.append(p)
+            n //= p
+    p = 7
+    for step in itertools.cycle((4, 2, 4, 2, 4, 6, 2, 6)):
+        if p * p > n:
             break
         q, r = divmod(n, p)
-        if p == 313:
-            print(f'division by 313: {n} = 313*{q} + {r}')
         while not r:
-            print(' divisible by', p)
             factors.append(p)
             n = q
             q, r = divmod(n, p)
-    return tuple((p, len(list(g))) for p, g in itertools.groupby(factors))
+        p += step
+    if n > 1:
+        # Whatever remains is prime
+        factors.append(n)
+    return tuple(sorted(Counter(factors).items()))
 
 
 def _phi(p: int, exp: int) -> int:
@@ -191,7 +246,7 @@ def phi(n: int) -> int:
 
 def powmod(base: int, exp: int, mod: int) -> int:
     """Compute base^exp (mod mod)"""
-    return int(Modular(mod)(base) ** exp)
+    return pow(base, exp, mod)
 
 
 if __name__ == '__main__':